@@ -1,9 +1,20 @@
 """
 命令处理模块
 """
-from nonebot import on_regex
+import asyncio
+import functools
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+
+from nonebot import get_driver, on_fullmatch
 from nonebot.adapters.onebot.v11 import Bot, Event
+from nonebot.params import Fullmatch
 import httpx
+import orjson
 from .config import GZCTF_BASE_URL, TARGET_GAME_ID
 from .utils import (
     validate_command_prerequisites,
@@ -13,17 +24,93 @@ from .utils import (
 )
 from .notifications import set_auto_broadcast_enabled, is_auto_broadcast_enabled
 
+logger = logging.getLogger(__name__)
 
-# 排行榜查询命令
-rank = on_regex(r'^/rank$', priority=5)
-# 比赛信息查询命令
-game = on_regex(r'^/game$', priority=5)
-# 自动播报控制命令
-open_broadcast = on_regex(r'^/open$', priority=5)
-close_broadcast = on_regex(r'^/close$', priority=5)
+driver = get_driver()
+
+# 全局共享的 HTTP 客户端，复用 keep-alive 连接，避免每次命令都重新握手
+_client = httpx.AsyncClient(
+    base_url=GZCTF_BASE_URL or "",
+    timeout=10.0,
+    limits=httpx.Limits(max_keepalive_connections=20),
+)
+
+
+@driver.on_shutdown
+async def _close_client() -> None:
+    """关闭时释放 HTTP 客户端"""
+    await _client.aclose()
+
+
+# GZCTF API 响应缓存：url -> (缓存时间, JSON 数据)，按 LRU 淘汰
+HTTP_CACHE_TTL = 10
+HTTP_CACHE_MAX_SIZE = 64
+_http_cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+# 进行中的请求：相同 url 的并发请求共享同一个结果
+_inflight: Dict[str, "asyncio.Task[Any]"] = {}
+# 限制同时发往 GZCTF 的请求数
+_http_semaphore = asyncio.Semaphore(8)
+
+
+async def _fetch_json(url: str) -> Any:
+    """请求 url 并写入缓存，返回解析后的 JSON 数据"""
+    async with _http_semaphore:
+        response = await _client.get(url)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+
+    _http_cache[url] = (time.monotonic(), data)
+    _http_cache.move_to_end(url)
+    while len(_http_cache) > HTTP_CACHE_MAX_SIZE:
+        _http_cache.popitem(last=False)
+    return data
+
+
+def _on_fetch_done(url: str, task: "asyncio.Task[Any]") -> None:
+    """共享请求结束后移出进行中列表，并取出异常，避免调用方均被取消时异常无人处理"""
+    _inflight.pop(url, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("fetch %s failed: %s", url, task.exception())
+
+
+async def cached_get(url: str, ttl: float = HTTP_CACHE_TTL) -> Any:
+    """带 TTL 缓存的 GET 请求，返回解析后的 JSON 数据"""
+    entry = _http_cache.get(url)
+    if entry and time.monotonic() - entry[0] < ttl:
+        _http_cache.move_to_end(url)
+        return entry[1]
+
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_json(url))
+        _inflight[url] = task
+        task.add_done_callback(functools.partial(_on_fetch_done, url))
+    # shield 避免某个调用方被取消时连带取消共享的请求
+    return await asyncio.shield(task)
+
+
+# 消息分隔线与前三名奖牌图标
+_SEP = "=" * 30
+_RANK_EMOJIS = {1: "🥇", 2: "🥈", 3: "🥉"}
+# 东八区时区
+_CST = timezone(timedelta(hours=8))
+
+# 统一的命令匹配器：/rank 排行榜、/game 比赛信息、/open 与 /close 播报控制
+command = on_fullmatch(("/rank", "/game", "/open", "/close"), priority=5)
+
+
+def _format_rank_line(item: Dict[str, Any]) -> str:
+    """格式化排行榜中的一行，前三名使用奖牌图标，其他使用序号"""
+    team_rank = item.get("rank", 0)
+    name = item.get("name", "未知队伍")
+    score = item.get("score", 0)
+    emoji = _RANK_EMOJIS.get(team_rank)
+    if emoji:
+        return f"{emoji} {name} - {score}分"
+    return f"{team_rank}. {name} - {score}分"
 
 
-@rank.handle()
 async def handle_rank(bot: Bot, event: Event):
     """处理排行榜查询命令"""
     # 验证权限
@@ -31,74 +118,42 @@ async def handle_rank(bot: Bot, event: Event):
     if error_msg:
         if error_msg == "PERMISSION_DENIED":
             return  # 静默处理权限拒绝
-        await rank.finish(error_msg)
+        await command.finish(error_msg)
 
     try:
-        async with httpx.AsyncClient() as client:
-            # 获取比赛信息
-            game_info_url = f"{GZCTF_BASE_URL}/api/game/{TARGET_GAME_ID}"
-            game_info_response = await client.get(game_info_url, timeout=10.0)
-            game_info_response.raise_for_status()
-            game_info = game_info_response.json()
-            game_title = game_info.get("title", "GZCTF")
-
-            # 获取排行榜数据
-            scoreboard_url = f"{GZCTF_BASE_URL}/api/game/{TARGET_GAME_ID}/scoreboard"
-            scoreboard_response = await client.get(scoreboard_url, timeout=10.0)
-            scoreboard_response.raise_for_status()
-            data = scoreboard_response.json()
+        # 并发获取比赛信息和排行榜数据（两个接口互不依赖）
+        game_info_url = f"/api/game/{TARGET_GAME_ID}"
+        scoreboard_url = f"/api/game/{TARGET_GAME_ID}/scoreboard"
+        game_info, data = await asyncio.gather(
+            cached_get(game_info_url),
+            cached_get(scoreboard_url),
+        )
+        game_title = game_info.get("title", "GZCTF")
 
         # 解析数据 - 使用 items 字段获取完整排行榜
         items = data.get("items", [])
         if not items:
-            await rank.finish("暂无排行榜数据。")
-
-        # 提取所有队伍数据
-        sorted_items = []
-        for item in items:
-            name = item.get("name", "未知队伍")
-            team_rank = item.get("rank", 0)
-            score = item.get("score", 0)
-            sorted_items.append({"name": name, "score": score, "rank": team_rank})
-
-        # 按照 rank 排序（如果 API 已经提供了排名）
-        sorted_items.sort(key=lambda x: x["rank"])
-
-        if not sorted_items:
-            await rank.finish("暂无排行榜数据。")
-
-        # 格式化排行榜消息
-        rank_emojis = {1: "🥇", 2: "🥈", 3: "🥉"}
-        total_teams = len(sorted_items)
-        text_lines = [f"{game_title} 排行榜", "=" * 30]
-
-        for item in sorted_items:
-            team_rank = item['rank']
-            name = item['name']
-            score = item['score']
-
-            # 前三名使用奖牌图标，其他使用序号
-            if team_rank <= 3:
-                emoji = rank_emojis[team_rank]
-                text_lines.append(f"{emoji} {name} - {score}分")
-            else:
-                text_lines.append(f"{team_rank}. {name} - {score}分")
-
-        text_lines.append("=" * 30)
-        message = "\n".join(text_lines)
+            await command.finish("暂无排行榜数据。")
+
+        # API 返回的数据已按 rank 排序，仅在检测到乱序时才排序（不修改缓存中的原始列表）
+        if any(a.get("rank", 0) > b.get("rank", 0) for a, b in itertools.pairwise(items)):
+            items = sorted(items, key=lambda x: x.get("rank", 0))
+
+        # 直接遍历 items 生成排行榜行
+        body = [_format_rank_line(item) for item in items]
+        message = "\n".join((f"{game_title} 排行榜", _SEP, *body, _SEP))
         await send_response(bot, event, message, "rank")
 
 
     except httpx.TimeoutException:
-        await rank.finish("查询排行榜超时，请稍后重试。")
+        await command.finish("查询排行榜超时，请稍后重试。")
     except httpx.HTTPStatusError as e:
-        await rank.finish(f"查询排行榜失败！")
+        await command.finish(f"查询排行榜失败！")
     except Exception as e:
         log_database_error("rank", e)
-        await rank.finish("查询排行榜失败！")
+        await command.finish("查询排行榜失败！")
 
 
-@game.handle()
 async def handle_game(bot: Bot, event: Event):
     """处理比赛信息查询命令"""
     # 验证权限
@@ -106,17 +161,14 @@ async def handle_game(bot: Bot, event: Event):
     if error_msg:
         if error_msg == "PERMISSION_DENIED":
             return  # 静默处理权限拒绝
-        await game.finish(error_msg)
+        await command.finish(error_msg)
 
     try:
         # 构造 API URL
-        api_url = f"{GZCTF_BASE_URL}/api/game/{TARGET_GAME_ID}"
+        api_url = f"/api/game/{TARGET_GAME_ID}"
 
         # 调用 API 获取比赛信息
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        data = await cached_get(api_url)
 
         # 提取比赛信息
         title = data.get("title", "未知比赛")
@@ -124,45 +176,39 @@ async def handle_game(bot: Bot, event: Event):
         end_timestamp = data.get("end", 0)
 
         # 转换时间戳为可读格式（毫秒转秒）
-        from datetime import datetime, timezone, timedelta
-
-        # 使用东八区时区
-        tz = timezone(timedelta(hours=8))
-
         if start_timestamp:
-            start_time = datetime.fromtimestamp(start_timestamp / 1000, tz=tz)
+            start_time = datetime.fromtimestamp(start_timestamp / 1000, tz=_CST)
             start_str = start_time.strftime("%Y-%m-%d %H:%M:%S")
         else:
             start_str = "未设置"
 
         if end_timestamp:
-            end_time = datetime.fromtimestamp(end_timestamp / 1000, tz=tz)
+            end_time = datetime.fromtimestamp(end_timestamp / 1000, tz=_CST)
             end_str = end_time.strftime("%Y-%m-%d %H:%M:%S")
         else:
             end_str = "未设置"
 
         text_lines = [
             f"{title}",
-            "=" * 30,
+            _SEP,
             f"开始时间: {start_str}",
             f"结束时间: {end_str}",
             f"比赛网址:{GZCTF_BASE_URL}/games/{TARGET_GAME_ID}",
-            "=" * 30
+            _SEP
         ]
 
         message = "\n".join(text_lines)
         await send_response(bot, event, message, "game")
 
     except httpx.TimeoutException:
-        await game.finish("查询比赛信息超时，请稍后重试。")
+        await command.finish("查询比赛信息超时，请稍后重试。")
     except httpx.HTTPStatusError as e:
-        await game.finish(f"查询比赛信息失败！")
+        await command.finish(f"查询比赛信息失败！")
     except Exception as e:
         log_database_error("game", e)
-        await game.finish("查询比赛信息失败！")
+        await command.finish("查询比赛信息失败！")
 
 
-@open_broadcast.handle()
 async def handle_open_broadcast(bot: Bot, event: Event):
     """开启自动播报"""
     # 检查管理员权限
@@ -175,7 +221,7 @@ async def handle_open_broadcast(bot: Bot, event: Event):
     if error_msg:
         if error_msg == "PERMISSION_DENIED":
             return
-        await open_broadcast.finish(error_msg)
+        await command.finish(error_msg)
 
     try:
         if is_auto_broadcast_enabled():
@@ -187,7 +233,6 @@ async def handle_open_broadcast(bot: Bot, event: Event):
         log_database_error("open", e)
 
 
-@close_broadcast.handle()
 async def handle_close_broadcast(bot: Bot, event: Event):
     """关闭自动播报"""
     # 检查管理员权限
@@ -200,7 +245,7 @@ async def handle_close_broadcast(bot: Bot, event: Event):
     if error_msg:
         if error_msg == "PERMISSION_DENIED":
             return
-        await close_broadcast.finish(error_msg)
+        await command.finish(error_msg)
 
     try:
         if not is_auto_broadcast_enabled():
@@ -210,3 +255,19 @@ async def handle_close_broadcast(bot: Bot, event: Event):
         await send_response(bot, event, "已关闭自动播报。", "close")
     except Exception as e:
         log_database_error("close", e)
+
+
+_COMMAND_HANDLERS = {
+    "/rank": handle_rank,
+    "/game": handle_game,
+    "/open": handle_open_broadcast,
+    "/close": handle_close_broadcast,
+}
+
+
+@command.handle()
+async def handle_command(bot: Bot, event: Event, matched: str = Fullmatch()):
+    """根据匹配到的命令分发到对应的处理函数"""
+    handler = _COMMAND_HANDLERS.get(matched)
+    if handler:
+        await handler(bot, event)
@@ -46,3 +46,13 @@ CATEGORY_MAPPING = {
     11: "Pentest",
     12: "OSINT"
 }
+
+# 通知 Type 数字到显示标签的映射
+NOTICE_TYPE_MAPPING = {
+    0: "📢 公告通知",
+    1: "🥇 一血通知",
+    2: "🥈 二血通知",
+    3: "🥉 三血通知",
+    4: "💡 提示更新",
+    5: "🆕 新题目开放"
+}
@@ -1,104 +1,199 @@
 """
 数据库操作模块
 """
+import asyncio
+import functools
+import json
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
 import asyncpg
+from nonebot import get_driver
+
 from .config import POSTGRES_DSN, TARGET_GAME_ID
 
+logger = logging.getLogger(__name__)
+
+driver = get_driver()
+
+# 全局连接池，首次使用时创建，避免每次查询都重新建立连接
+_pool: Optional[asyncpg.Pool] = None
+# 保证并发调用时只创建一个连接池
+_pool_lock = asyncio.Lock()
+
+# 赛事标题缓存：game_id -> (缓存时间, 标题)，比赛期间标题基本不变
+GAME_TITLE_CACHE_TTL = 300
+_title_cache: Dict[int, Tuple[float, str]] = {}
+
+# 题目信息缓存：(game_id, 题目名) -> (缓存时间, 记录)，比赛期间题目基本不变
+CHALLENGE_INFO_CACHE_TTL = 60
+_challenge_cache: Dict[Tuple[int, str], Tuple[float, asyncpg.Record]] = {}
+
+# 查询语句保持为模块级常量，文本固定，便于命中 asyncpg 的预编译语句缓存
+GAME_TITLE_QUERY = 'SELECT "Title" FROM "Games" WHERE "Id" = $1'
+
+# 最近通知查询；窗口内的通知都需要播报，因此不限制条数。配合索引
+# CREATE INDEX IF NOT EXISTS idx_notices_game_time ON "GameNotices" ("GameId", "PublishTimeUtc" DESC);
+# 可同时用于 WHERE 范围过滤和 ORDER BY，避免额外排序
+RECENT_NOTICES_QUERY = """
+    SELECT
+        gn."Id",
+        gn."Type",
+        gn."Values",
+        gn."PublishTimeUtc"
+    FROM "GameNotices" gn
+    WHERE gn."GameId" = $1
+      AND gn."PublishTimeUtc" > $2
+    ORDER BY gn."PublishTimeUtc" DESC;
+"""
+
+# 按题目名称查询题目信息
+CHALLENGE_BY_NAME_QUERY = """
+    SELECT
+        gc."Title",
+        gc."Category"
+    FROM "GameChallenges" gc
+    WHERE gc."GameId" = $1 AND gc."Title" = $2
+    LIMIT 1;
+"""
+
+# 按题目名称批量查询题目信息
+CHALLENGES_BY_NAMES_QUERY = """
+    SELECT
+        gc."Title",
+        gc."Category"
+    FROM "GameChallenges" gc
+    WHERE gc."GameId" = $1 AND gc."Title" = ANY($2::text[]);
+"""
+
+
+async def get_pool() -> asyncpg.Pool:
+    """获取全局数据库连接池（懒加载）"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    POSTGRES_DSN,
+                    min_size=1,
+                    max_size=10,
+                    statement_cache_size=1024,
+                    max_inactive_connection_lifetime=300,
+                )
+    return _pool
+
+
+@driver.on_startup
+async def _init_pool() -> None:
+    """启动时预先创建连接池，失败时不影响启动，后续查询时再重试"""
+    if POSTGRES_DSN:
+        try:
+            await get_pool()
+        except Exception as e:
+            logger.warning("init database pool failed, will retry on demand: %s", e)
+
+
+@driver.on_shutdown
+async def _close_pool() -> None:
+    """关闭时释放连接池"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
 
 async def get_game_title(game_id: int) -> str:
-    """根据赛事ID获取赛事标题"""
-    conn = await asyncpg.connect(POSTGRES_DSN)
+    """根据赛事ID获取赛事标题（带 TTL 缓存）"""
+    entry = _title_cache.get(game_id)
+    if entry and time.monotonic() - entry[0] < GAME_TITLE_CACHE_TTL:
+        return entry[1]
+
     try:
-        game_record = await conn.fetchrow('SELECT "Title" FROM "Games" WHERE "Id" = $1', game_id)
-        if not game_record:
-            raise ValueError(f"未找到ID为 {game_id} 的比赛")
-        return game_record['Title']
-    finally:
-        await conn.close()
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            game_record = await conn.fetchrow(GAME_TITLE_QUERY, game_id)
+    except Exception:
+        # 数据库异常时使缓存失效，下次重新查询
+        _title_cache.pop(game_id, None)
+        raise
+
+    if not game_record:
+        raise ValueError(f"未找到ID为 {game_id} 的比赛")
+    title = game_record['Title']
+    _title_cache[game_id] = (time.monotonic(), title)
+    return title
 
 
 async def get_recent_notices(game_id: int, seconds: int = 10):
     """获取最近的赛事通知"""
     from datetime import datetime, timedelta
 
-    conn = await asyncpg.connect(POSTGRES_DSN)
-    try:
-        query = """
-        SELECT
-            gn."Id",
-            gn."Type",
-            gn."Values",
-            gn."PublishTimeUtc",
-            CASE gn."Type"
-                WHEN 0 THEN '📢 公告通知'
-                WHEN 1 THEN '🥇 一血通知'
-                WHEN 2 THEN '🥈 二血通知'
-                WHEN 3 THEN '🥉 三血通知'
-                WHEN 4 THEN '💡 提示更新'
-                WHEN 5 THEN '🆕 新题目开放'
-                ELSE '❓ 未知类型'
-            END as notice_type
-        FROM "GameNotices" gn
-        WHERE gn."GameId" = $1
-          AND gn."PublishTimeUtc" > $2
-        ORDER BY gn."PublishTimeUtc" DESC;
-        """
-
-        time_ago = datetime.utcnow() - timedelta(seconds=seconds)
-        rows = await conn.fetch(query, game_id, time_ago)
+    time_ago = datetime.utcnow() - timedelta(seconds=seconds)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(RECENT_NOTICES_QUERY, game_id, time_ago)
         return rows
-    finally:
-        await conn.close()
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_challenge_value(value: str) -> str:
+    """解析 Values 字段中的题目名称
+
+    Values 可能是 JSON 格式如 ["题目名"] 或直接是题目名
+    """
+    # 如果是 JSON 数组格式，提取第一个元素
+    if value.startswith('[') and value.endswith(']'):
+        try:
+            parsed_values = json.loads(value)
+            if isinstance(parsed_values, list) and len(parsed_values) > 0:
+                return str(parsed_values[0])
+        except json.JSONDecodeError:
+            pass  # 如果解析失败，使用原始名称
+    return value
 
 
 async def get_challenge_info_by_name(game_id: int, challenge_name: str):
-    """根据题目名称获取题目信息"""
-    import json
+    """根据题目名称获取题目信息（带 TTL 缓存）"""
+    actual_challenge_name = _parse_challenge_value(challenge_name)
 
-    conn = await asyncpg.connect(POSTGRES_DSN)
-    try:
-        # 首先尝试直接匹配
-        query = """
-        SELECT
-            gc."Title",
-            gc."Category",
-            CASE gc."Category"
-                WHEN 0 THEN 'Misc'
-                WHEN 1 THEN 'Crypto'
-                WHEN 2 THEN 'Pwn'
-                WHEN 3 THEN 'Web'
-                WHEN 4 THEN 'Reverse'
-                WHEN 5 THEN 'Blockchain'
-                WHEN 6 THEN 'Forensics'
-                WHEN 7 THEN 'Hardware'
-                WHEN 8 THEN 'Mobile'
-                WHEN 9 THEN 'PPC'
-                WHEN 10 THEN 'AI'
-                WHEN 11 THEN 'Pentest'
-                WHEN 12 THEN 'OSINT'
-                ELSE 'Unknown'
-            END as CategoryName
-        FROM "GameChallenges" gc
-        WHERE gc."GameId" = $1 AND gc."Title" = $2
-        LIMIT 1;
-        """
-
-        # 处理 Values 字段中的题目名称
-        # Values 可能是 JSON 格式如 ["题目名"] 或直接是题目名
-        actual_challenge_name = challenge_name
-
-        # 如果是 JSON 数组格式，提取第一个元素
-        if challenge_name.startswith('[') and challenge_name.endswith(']'):
-            try:
-                parsed_values = json.loads(challenge_name)
-                if isinstance(parsed_values, list) and len(parsed_values) > 0:
-                    actual_challenge_name = str(parsed_values[0])
-            except json.JSONDecodeError:
-                pass  # 如果解析失败，使用原始名称
-
-
-
-        result = await conn.fetchrow(query, game_id, actual_challenge_name)
-        return result
-    finally:
-        await conn.close()
+    key = (game_id, actual_challenge_name)
+    entry = _challenge_cache.get(key)
+    if entry and time.monotonic() - entry[0] < CHALLENGE_INFO_CACHE_TTL:
+        return entry[1]
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        result = await conn.fetchrow(CHALLENGE_BY_NAME_QUERY, game_id, actual_challenge_name)
+
+    # 仅缓存查到的题目，避免题目尚未入库时缓存空结果
+    if result:
+        _challenge_cache[key] = (time.monotonic(), result)
+    return result
+
+
+async def get_challenge_infos_by_names(game_id: int, challenge_names: Iterable[str]) -> Dict[str, asyncpg.Record]:
+    """根据多个题目名称批量获取题目信息，未命中缓存的题目只查询一次数据库
+
+    Returns:
+        题目名称到题目记录的映射，未找到的题目不包含在内
+    """
+    results: Dict[str, asyncpg.Record] = {}
+    missing = []
+    now = time.monotonic()
+    for name in {_parse_challenge_value(n) for n in challenge_names}:
+        entry = _challenge_cache.get((game_id, name))
+        if entry and now - entry[0] < CHALLENGE_INFO_CACHE_TTL:
+            results[name] = entry[1]
+        else:
+            missing.append(name)
+
+    if missing:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(CHALLENGES_BY_NAMES_QUERY, game_id, missing)
+        now = time.monotonic()
+        for row in rows:
+            results[row["Title"]] = row
+            _challenge_cache[(game_id, row["Title"])] = (now, row)
+    return results
@@ -11,8 +11,13 @@ from typing import Callable, Dict, List, Optional, Set
 
 from nonebot import get_driver, require
 
-from .config import ALLOWED_GROUP_IDS, TARGET_GAME_ID
-from .database import get_recent_notices, get_challenge_info_by_name, get_game_title
+from .config import ALLOWED_GROUP_IDS, CATEGORY_MAPPING, NOTICE_TYPE_MAPPING, TARGET_GAME_ID
+from .database import (
+    get_challenge_info_by_name,
+    get_challenge_infos_by_names,
+    get_game_title,
+    get_recent_notices,
+)
 from .utils import (
     decode_unicode_values,
     extract_challenge_name_from_values,
@@ -44,6 +49,10 @@ class NotificationConfig:
     BEIJING_TZ: timezone = timezone(timedelta(hours=8))
 
 
+# 需要查询题目信息的通知 Type：4 提示更新、5 新题目开放
+_CHALLENGE_NOTICE_TYPES = {4, 5}
+
+
 # 状态
 broadcasted_notices: Set[int] = set()
 last_checked_time: Optional[datetime] = None  # UTC
@@ -96,7 +105,7 @@ async def _fmt_new(values: str, publish_time: datetime) -> Optional[str]:
         info = await get_challenge_info_by_name(int(TARGET_GAME_ID), values)
         name = extract_challenge_name_from_values(values)
         if info:
-            category = info.get("categoryname", "未知")
+            category = CATEGORY_MAPPING.get(info["Category"], "Unknown")
             return (
                 f"{_border('上题目啦')}\n"
                 f"比赛: {base['game_title']}\n"
@@ -116,7 +125,7 @@ async def _fmt_hint(values: str, publish_time: datetime) -> Optional[str]:
         base = await _base(values, publish_time)
         info = await get_challenge_info_by_name(int(TARGET_GAME_ID), values)
         name = extract_challenge_name_from_values(values)
-        category = info.get("categoryname", "未知") if info else "未知"
+        category = CATEGORY_MAPPING.get(info["Category"], "Unknown") if info else "未知"
         return (
             f"{_border('题目提示更新')}\n"
             f"比赛: {base['game_title']}\n"
@@ -232,11 +241,23 @@ async def check_and_broadcast_notices() -> None:
     rows: List[Dict] = []
     rows = await get_recent_notices(int(TARGET_GAME_ID), seconds=window_seconds)
 
+    # 一次性预取新题目/提示通知涉及的题目信息，后续格式化时直接命中缓存
+    challenge_names = [
+        row.get("Values") or ""
+        for row in rows
+        if row["Id"] not in broadcasted_notices and row["Type"] in _CHALLENGE_NOTICE_TYPES
+    ]
+    if challenge_names:
+        try:
+            await get_challenge_infos_by_names(int(TARGET_GAME_ID), challenge_names)
+        except Exception as e:
+            logger.warning("prefetch challenge info failed: %s", e)
+
     for row in rows:
         notice_id = row["Id"]
         if notice_id in broadcasted_notices:
             continue
-        notice_type = row["notice_type"]
+        notice_type = NOTICE_TYPE_MAPPING.get(row["Type"], "❓ 未知类型")
         values = row.get("Values") or ""
         publish_time = row["PublishTimeUtc"]
 
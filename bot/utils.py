@@ -8,6 +8,8 @@ import logging
 from typing import Any, Dict, List, Optional, Union
 from nonebot.adapters.onebot.v11 import Bot, Event, GroupMessageEvent
 
+from .config import ADMIN_QQ_IDS, ALLOWED_GROUP_IDS, POSTGRES_DSN, TARGET_GAME_ID
+
 logger = logging.getLogger(__name__)
 
 
@@ -179,8 +181,6 @@ def check_group_permission(event: Event) -> bool:
     Returns:
         是否有权限
     """
-    from .config import ALLOWED_GROUP_IDS
-
     if ALLOWED_GROUP_IDS:
         if not isinstance(event, GroupMessageEvent) or getattr(event, "group_id", None) not in ALLOWED_GROUP_IDS:
             return False
@@ -196,8 +196,6 @@ def check_admin_permission(event: Event) -> bool:
     Returns:
         是否有管理员权限
     """
-    from .config import ADMIN_QQ_IDS
-
     if ADMIN_QQ_IDS:
         user_id = getattr(event, "user_id", None)
         if user_id is None or user_id not in ADMIN_QQ_IDS:
@@ -215,8 +213,6 @@ async def validate_command_prerequisites(command_name: str, event: Event) -> Opt
     Returns:
         如果有错误返回错误消息，否则返回None
     """
-    from .config import POSTGRES_DSN, TARGET_GAME_ID
-
     # 权限检查
     if not check_group_permission(event):
         return "PERMISSION_DENIED"  # 特殊标记，表示权限被拒绝